@@ -2,29 +2,121 @@ import os
 import glob
 import logging
 from copy import copy
-from docx2pdf import convert
-import PyPDF2
 from tempfile import NamedTemporaryFile
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.colors import HexColor
-from io import BytesIO
 import sys
 import shutil
+import hashlib
+import json
+import time
+import argparse
+import threading
+import posixpath
+from array import array
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Heavy dependencies (PyPDF2, reportlab, docx2pdf, boto3) are imported inside the
+# functions that use them, so short runs ("No documents found", PDF-only mandates)
+# never pay for loading them. See script/startup_benchmark.py for the startup budget.
+
+__version__ = '2.0'
 
 # Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_MODES = ('text', 'json', 'quiet')
+# Run summaries sit above WARNING so they still reach the console in quiet mode
+SUMMARY = logging.WARNING + 5
+logging.addLevelName(SUMMARY, 'SUMMARY')
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per log record; stage events carry their fields at top level"""
+    def format(self, record):
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+        }
+        event = getattr(record, 'event', None)
+        if event is not None:
+            payload.update(event)
+        else:
+            payload['msg'] = record.getMessage()
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class _LogLineCounter(logging.Filter):
+    """Counts records that actually reach the console, reported in the 'run' event"""
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+    
+    def filter(self, record):
+        self.count += 1
+        return True
+
+LOG_LINE_COUNTER = _LogLineCounter()
+
+class _EventFields:
+    """Lazily renders event fields as 'key=value' pairs (only when a text record is emitted)"""
+    def __init__(self, fields):
+        self.fields = fields
+    
+    def __str__(self):
+        return ' '.join(f"{k}={v}" for k, v in self.fields.items())
+
+def configure_logging(mode='text', verbose=False):
+    """Install the console handler for the chosen mode
+    
+    text  - human readable lines (default)
+    json  - one JSON object per line, per-stage events with aggregated counts
+    quiet - warnings, errors and the closing 'run' summary, for scheduled production runs
+    """
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode '{mode}' (expected one of {', '.join(LOG_MODES)})")
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonLogFormatter() if mode == 'json' else logging.Formatter(LOG_FORMAT))
+    handler.addFilter(LOG_LINE_COUNTER)
+    
+    root = logging.getLogger()
+    for old_handler in list(root.handlers):
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    if verbose:
+        root.setLevel(logging.DEBUG)
+    else:
+        root.setLevel(logging.WARNING if mode == 'quiet' else logging.INFO)
+    CONFIG['logging']['mode'] = mode
+
+def log_event(stage, level=logging.INFO, **fields):
+    """Emit one structured event for a pipeline stage with aggregated counts"""
+    event = {'stage': stage}
+    event.update(fields)
+    logging.log(level, "[%s] %s", stage, _EventFields(fields), extra={'event': event})
+
+def log_sampled(index, message, *args):
+    """Hot-loop debug logging: lazily formatted, only every Nth item is emitted"""
+    if index % CONFIG['logging']['sample_every'] == 0:
+        logging.debug(message, *args)
 
 def get_base_path():
     """Get the project root directory
     
     When running as Python script: Returns parent of script directory
-    When running as EXE: Returns parent of dist directory (project root)
+    When running as EXE: Returns parent of dist directory (project root), for both
+    PyInstaller --onefile (dist/document_processor.exe) and --onedir
+    (dist/document_processor/document_processor.exe) builds
     """
     if getattr(sys, 'frozen', False):
         # Running as EXE: sys.executable is dist/document_processor.exe
         # Go up one level to get project root
-        exe_dir = os.path.dirname(sys.executable)  # dist/
+        exe_dir = os.path.dirname(os.path.abspath(sys.executable))  # dist/
+        # --onedir unpacks the bundle next to the exe (sys._MEIPASS is exe_dir or
+        # exe_dir/_internal); --onefile unpacks it to a temp folder elsewhere
+        bundle_dir = os.path.normcase(os.path.abspath(getattr(sys, '_MEIPASS', '')))
+        if bundle_dir == os.path.normcase(exe_dir) or bundle_dir.startswith(os.path.normcase(exe_dir) + os.sep):
+            exe_dir = os.path.dirname(exe_dir)  # dist/document_processor/ -> dist/
         project_root = os.path.dirname(exe_dir)     # project_root/
         logging.debug(f"Running as EXE - Project root: {project_root}")
         return project_root
@@ -48,7 +140,8 @@ def ensure_directories():
         for dir_name, directory in [
             ('output', CONFIG['output_dir']),
             ('processed', CONFIG['processed_dir']),
-            ('error', CONFIG['error_dir'])
+            ('error', CONFIG['error_dir']),
+            ('cache', CONFIG['cache_dir'])
         ]:
             if not os.path.exists(directory):
                 try:
@@ -72,25 +165,18 @@ def ensure_directories():
         print(f"   Please check folder permissions and disk space")
         raise
 
-def move_file_to_processed(file_path):
-    """Move successfully processed file to processed folder"""
+def move_file_to_processed(file_path, marker=None):
+    """Move successfully processed file to processed folder
+    
+    An optional marker (e.g. 'DUPLICATE') is appended to the stored filename
+    so skipped inputs can be told apart from files that went into the output.
+    """
     try:
-        if not os.path.exists(file_path):
+        destination = get_storage().move(file_path, 'processed', marker)
+        if destination is None:
             logging.warning(f"File not found for moving to processed: {file_path}")
             return None
-        
-        filename = os.path.basename(file_path)
-        destination = os.path.join(CONFIG['processed_dir'], filename)
-        
-        # Handle duplicate filenames
-        counter = 1
-        base, ext = os.path.splitext(filename)
-        while os.path.exists(destination):
-            destination = os.path.join(CONFIG['processed_dir'], f"{base}_{counter}{ext}")
-            counter += 1
-        
-        shutil.move(file_path, destination)
-        logging.info(f"✓ Moved to processed: {filename}")
+        logging.debug("✓ Moved to processed: %s", os.path.basename(destination))
         return destination
     except Exception as e:
         logging.error(f"Failed to move processed file {file_path}: {e}")
@@ -99,27 +185,228 @@ def move_file_to_processed(file_path):
 def move_file_to_error(file_path, error_message=""):
     """Move file to error folder with logging"""
     try:
-        if not os.path.exists(file_path):
+        destination = get_storage().move(file_path, 'error')
+        if destination is None:
             logging.warning(f"File not found for moving to error: {file_path}")
             return None
-        
-        filename = os.path.basename(file_path)
-        destination = os.path.join(CONFIG['error_dir'], filename)
-        
-        # Handle duplicate filenames
-        counter = 1
-        base, ext = os.path.splitext(filename)
-        while os.path.exists(destination):
-            destination = os.path.join(CONFIG['error_dir'], f"{base}_{counter}{ext}")
-            counter += 1
-        
-        shutil.move(file_path, destination)
-        logging.error(f"✗ Moved to error folder: {filename} | Reason: {error_message}")
+        logging.error(f"✗ Moved to error folder: {os.path.basename(destination)} | Reason: {error_message}")
         return destination
     except Exception as e:
         logging.error(f"Failed to move error file {file_path}: {e}")
         return None
 
+def _unique_name(filename, taken, marker=None):
+    """Pick 'name[_marker][_N].ext' that is not in taken (collision-safe destination name)"""
+    base, ext = os.path.splitext(filename)
+    if marker:
+        base = f"{base}_{marker}"
+    candidate = f"{base}{ext}"
+    counter = 1
+    while candidate in taken:
+        candidate = f"{base}_{counter}{ext}"
+        counter += 1
+    return candidate
+
+class LocalStorage:
+    """Input, output, processed and error locations as local (or mounted) directories"""
+    def __init__(self, config):
+        self.dirs = {
+            'input': config['input_dir'],
+            'output': config['output_dir'],
+            'processed': config['processed_dir'],
+            'error': config['error_dir'],
+        }
+        self._taken = {}
+        self._lock = threading.Lock()
+    
+    def describe(self, location):
+        return self.dirs[location]
+    
+    def list_files(self, location):
+        """Sorted paths of the files (not subdirectories) in a location"""
+        directory = self.dirs[location]
+        if not os.path.isdir(directory):
+            return []
+        with os.scandir(directory) as entries:
+            return sorted(entry.path for entry in entries if entry.is_file())
+    
+    def prefetch(self, found_files):
+        """Inputs are already local; nothing to fetch"""
+        return found_files
+    
+    def is_input(self, file_path):
+        return os.path.dirname(os.path.abspath(file_path)) == os.path.abspath(self.dirs['input'])
+    
+    def _taken_names(self, location):
+        """Names in a location, listed once per run and kept current by move()"""
+        if location not in self._taken:
+            directory = self.dirs[location]
+            self._taken[location] = set(os.listdir(directory)) if os.path.isdir(directory) else set()
+        return self._taken[location]
+    
+    def move(self, file_path, location, marker=None):
+        """Move a file into a location without overwriting; returns the destination or None"""
+        with self._lock:
+            if not os.path.exists(file_path):
+                return None
+            taken = self._taken_names(location)
+            name = _unique_name(os.path.basename(file_path), taken, marker)
+            destination = os.path.join(self.dirs[location], name)
+            # The listing is only a hint: it is case-sensitive and goes stale if another
+            # run writes here, so the filesystem has the final say on each candidate
+            while os.path.exists(destination):
+                taken.add(name)
+                name = _unique_name(os.path.basename(file_path), taken, marker)
+                destination = os.path.join(self.dirs[location], name)
+            shutil.move(file_path, destination)
+            taken.add(name)
+            return destination
+    
+    def output_path(self, name):
+        """Local path to write an output file to before publish()"""
+        return os.path.join(self.dirs['output'], name)
+    
+    def publish(self, local_path, location='output'):
+        """Outputs are written in place; nothing to upload"""
+        return local_path
+
+class S3Storage:
+    """Locations as key prefixes in an S3-compatible bucket (AWS S3, MinIO, ...)
+    
+    Matched inputs are prefetched in parallel into a local scratch directory so the
+    pipeline works on local files; outputs are uploaded with multipart transfers.
+    Handles passed to move() may be scratch paths (mapped back to their key) or keys;
+    either way the key's scratch copy is removed.
+    """
+    def __init__(self, config):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError:
+            raise RuntimeError("S3 storage backend requires boto3 (pip install boto3)")
+        
+        storage_cfg = config['storage']
+        self.bucket = storage_cfg['bucket']
+        self.prefixes = storage_cfg['prefixes']
+        self.scratch_dir = storage_cfg['scratch_dir']
+        self.workers = storage_cfg.get('prefetch_workers', 8)
+        chunk = storage_cfg.get('multipart_chunksize_mb', 8) * 1024 * 1024
+        self.client = boto3.client('s3', endpoint_url=storage_cfg.get('endpoint_url'))
+        self.transfer_config = TransferConfig(multipart_threshold=chunk, multipart_chunksize=chunk,
+                                              max_concurrency=self.workers)
+        self._origin = {}   # scratch path -> key
+        self._scratch = {}  # key -> scratch path
+        self._taken = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.scratch_dir, exist_ok=True)
+    
+    def describe(self, location):
+        return f"s3://{self.bucket}/{self.prefixes[location]}"
+    
+    def _keys(self, location):
+        prefix = self.prefixes[location]
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []) if not obj['Key'].endswith('/'))
+        return sorted(keys)
+    
+    def list_files(self, location):
+        return self._keys(location)
+    
+    def prefetch(self, found_files):
+        """Download all matched inputs in parallel; returns found_files with scratch paths"""
+        def fetch(key):
+            local_path = os.path.join(self.scratch_dir, posixpath.basename(key))
+            self.client.download_file(self.bucket, key, local_path, Config=self.transfer_config)
+            return local_path
+        
+        keys = [key for files in found_files.values() for key in files]
+        local_paths = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            futures = {key: pool.submit(fetch, key) for key in keys}
+            for key, future in futures.items():
+                try:
+                    local_paths[key] = future.result()
+                    self._origin[local_paths[key]] = key
+                    self._scratch[key] = local_paths[key]
+                except Exception as e:
+                    logging.error(f"Prefetch failed for {key}: {e}")
+                    move_file_to_error(key, f"Download error: {e}")
+        log_event('prefetch', files=len(local_paths), failed=len(keys) - len(local_paths))
+        
+        prefetched = {}
+        for doc_type, files in found_files.items():
+            paths = [local_paths[key] for key in files if key in local_paths]
+            if paths:
+                prefetched[doc_type] = paths
+        return prefetched
+    
+    def is_input(self, file_path):
+        key = self._origin.get(file_path, file_path)
+        return posixpath.dirname(key) + '/' == self.prefixes['input']
+    
+    def _taken_names(self, location):
+        """Names under a location's prefix, listed once per run and kept current by move()"""
+        if location not in self._taken:
+            self._taken[location] = {posixpath.basename(k) for k in self._keys(location)}
+        return self._taken[location]
+    
+    def move(self, file_path, location, marker=None):
+        """Server-side copy + delete of the source key; drops the key's scratch copy if any"""
+        with self._lock:
+            key = self._origin.get(file_path, file_path)
+            try:
+                self.client.head_object(Bucket=self.bucket, Key=key)
+            except self.client.exceptions.ClientError:
+                return None
+            taken = self._taken_names(location)
+            name = _unique_name(posixpath.basename(key), taken, marker)
+            destination = self.prefixes[location] + name
+            self.client.copy({'Bucket': self.bucket, 'Key': key}, self.bucket, destination,
+                             Config=self.transfer_config)
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+            taken.add(name)
+            scratch_path = self._scratch.pop(key, None)
+            self._origin.pop(scratch_path, None)
+        
+        if scratch_path:
+            try:
+                os.remove(scratch_path)
+            except OSError:
+                pass
+        return f"s3://{self.bucket}/{destination}"
+    
+    def output_path(self, name):
+        return os.path.join(self.scratch_dir, name)
+    
+    def publish(self, local_path, location='output'):
+        """Multipart upload of a finished output file; the scratch copy is removed"""
+        destination = self.prefixes[location] + os.path.basename(local_path)
+        self.client.upload_file(local_path, self.bucket, destination, Config=self.transfer_config)
+        try:
+            os.remove(local_path)
+        except OSError:
+            pass
+        return f"s3://{self.bucket}/{destination}"
+
+STORAGE_BACKENDS = {
+    'local': LocalStorage,
+    's3': S3Storage,
+}
+
+_STORAGE = None
+
+def get_storage():
+    """Return the storage backend selected by CONFIG['storage']['backend'] (created once)"""
+    global _STORAGE
+    if _STORAGE is None:
+        backend = CONFIG['storage']['backend']
+        if backend not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend '{backend}' (expected one of {', '.join(STORAGE_BACKENDS)})")
+        _STORAGE = STORAGE_BACKENDS[backend](CONFIG)
+    return _STORAGE
+
 BASE_DIR = get_base_path()
 
 CONFIG = {
@@ -128,20 +415,81 @@ CONFIG = {
     'watermark_dir': os.path.join(BASE_DIR, 'watermarks'),
     'processed_dir': os.path.join(BASE_DIR, 'input', 'Import Directory', 'processed'),
     'error_dir': os.path.join(BASE_DIR, 'input', 'Import Directory', 'error'),
+    'cache_dir': os.path.join(BASE_DIR, 'cache'),
+    # Where input/output/processed/error live. 'local' uses the directories above;
+    # 's3' uses key prefixes in an S3-compatible bucket (set endpoint_url for MinIO)
+    # and requires boto3. Credentials come from the usual AWS environment/config.
+    # 's3' inputs are prefetched in parallel into scratch_dir, outputs uploaded multipart.
+    'storage': {
+        'backend': 'local',
+        'bucket': '',
+        'endpoint_url': None,
+        'prefixes': {
+            'input': 'Import Directory/',
+            'processed': 'Import Directory/processed/',
+            'error': 'Import Directory/error/',
+            'output': 'output/',
+        },
+        'scratch_dir': os.path.join(BASE_DIR, 'scratch'),
+        'prefetch_workers': 8,
+        'multipart_chunksize_mb': 8,
+    },
+    # Console logging: mode is 'text', 'json' or 'quiet' (overridable via --log-mode,
+    # --quiet or the DOC_PROCESSOR_LOG_MODE environment variable).
+    # Per-page/per-file detail is DEBUG only and sampled every 'sample_every' items.
+    'logging': {
+        'mode': 'text',
+        'sample_every': 25,
+    },
     'delete_input_after_processing': True,
     # Document types that should skip first-page watermark (common for cover letters)
     # Note: Empty because user wants watermarks on ALL pages now
     'skip_first_page_watermark_types': [],
+    # Content-hash deduplication, runs right after discovery.
+    # Byte-identical inputs (e.g. 'Beleg 1.pdf' and 'Beleg 1 (1).pdf') are collapsed
+    # to the copy in the highest-priority section (shortest name within a section);
+    # the other copies go to processed/ with the marker.
+    # 'per_page' additionally drops identical pages inside each merged section.
+    'dedup': {
+        'enabled': True,
+        'per_page': False,
+        'marker': 'DUPLICATE',
+    },
+    # Section result cache, keyed by content hash of a section's inputs plus WATERMARK_POLICY.
+    # Re-runs of a mandate rebuild only sections whose inputs changed.
+    # 'stamped' additionally caches each section after KOPIE stamping in the final merge.
+    # After each merge, entries unused for 'max_age_days' are removed, then the least
+    # recently used ones until the cache fits in 'max_size_mb' (None = no limit).
+    'section_cache': {
+        'enabled': True,
+        'stamped': True,
+        'max_size_mb': 500,
+        'max_age_days': 30,
+    },
+    # Sources left over once a section's 'page_budget' is filled are never opened;
+    # they are reported and moved to processed/ with this marker.
+    'unused_marker': 'UNUSED',
+    # PDF-only sections are assembled and stamped in worker processes and only ordered
+    # at the final merge; sections with DOCX sources are built in this process (Word/COM,
+    # one at a time). None = one worker per CPU (max 4); 1 = everything in-process.
+    'section_workers': None,
+    # Starting workers costs more than it saves on small mandates: below this many PDF
+    # pages the run stays in-process.
+    'section_pool_min_pages': 100,
     'document_types': {
         'anschreiben': {
             'prefixes': ['BaM', 'Übersendung', 'Wichtig', 'Anschreiben'], 
             'watermark': 'Wasserzeichen Anschreiben.pdf', 
-            'format': 'docx'
+            'format': 'docx',
+            # Cover Letter MUST be exactly 1 page (Page 1)
+            'page_budget': 1
         },
         'deckblatt': {
             'prefixes': ['Deckblatt', 'Deckblatt Steuer', 'Deckblatt Word', '440368', 'Cover', 'AP Deckblatt', 'JA AP', 'Deckblatt StE', 'deckblatt_steuererklaerung'], 
             'watermark': 'Wasserzeichen Deckblatt.pdf', 
-            'format': 'docx'
+            'format': 'docx',
+            # Cover Page MUST be exactly 1 page (Page 2)
+            'page_budget': 1
         },
         'berechnungen': {
             'prefixes': ['Berechnung', 'Kalkulation', '440372', 'Overview', 'Summary'], 
@@ -206,6 +554,209 @@ DISCOVERY_ORDER = [
     'attachments'
 ]
 
+# Describes everything that influences section assembly and stamping output.
+# Bump the version whenever that logic changes so stale cache entries are ignored.
+WATERMARK_POLICY = 'kopie-v3|alpha=0.15|font=width/6|p1=underlay|p2+=overlay|geometry=cropbox+rotate'
+
+def section_cache_key(doc_type, source_paths):
+    """Cache key for a section: watermark policy + type + content hash of every source, in order"""
+    digest = hashlib.sha256()
+    digest.update(WATERMARK_POLICY.encode('utf-8'))
+    digest.update(doc_type.encode('utf-8'))
+    digest.update(b'per_page_dedup' if CONFIG['dedup'].get('per_page') else b'')
+    digest.update(f"budget={CONFIG['document_types'][doc_type].get('page_budget')}".encode('ascii'))
+    for source_path in source_paths:
+        digest.update(_hash_file(source_path).encode('ascii'))
+    return digest.hexdigest()
+
+def _cache_path(kind, key, ext='.pdf'):
+    return os.path.join(CONFIG['cache_dir'], kind, f"{key}{ext}")
+
+def load_cached(kind, key):
+    """Return the cached PDF path for key, or None on a cache miss
+    
+    A hit refreshes the entry's mtime, which prune_cache uses as its last-use time.
+    """
+    path = _cache_path(kind, key)
+    if not os.path.isfile(path):
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+def load_cached_meta(kind, key):
+    """Return the metadata stored alongside a cache entry ({} if there is none)"""
+    try:
+        with open(_cache_path(kind, key, '.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def store_cached(kind, key, pdf_path, meta=None):
+    """Copy pdf_path (and optional metadata) into the cache atomically; return the cached path
+    
+    Returns pdf_path unchanged if the cache cannot be written.
+    """
+    path = _cache_path(kind, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if meta is not None:
+            meta_path = _cache_path(kind, key, '.json')
+            with open(f"{meta_path}.part", 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(f"{meta_path}.part", meta_path)
+        partial = f"{path}.part"
+        shutil.copyfile(pdf_path, partial)
+        os.replace(partial, path)
+        logging.debug(f"Cached {kind} result: {key[:12]}")
+        return path
+    except Exception as e:
+        logging.warning(f"Could not write {kind} cache entry: {e}")
+        return pdf_path
+
+def prune_cache():
+    """Apply the 'max_age_days' and 'max_size_mb' limits of CONFIG['section_cache']
+    
+    An entry is a key's .pdf plus its .json and leftover .part files; they are
+    removed together. Its last use is the newest mtime among them.
+    """
+    cache_cfg = CONFIG['section_cache']
+    max_age_days = cache_cfg.get('max_age_days')
+    max_size_mb = cache_cfg.get('max_size_mb')
+    
+    entries = {}
+    for kind_dir in glob.glob(os.path.join(CONFIG['cache_dir'], '*')):
+        if not os.path.isdir(kind_dir):
+            continue
+        with os.scandir(kind_dir) as files:
+            for entry in files:
+                if not entry.is_file():
+                    continue
+                key = entry.name.split('.', 1)[0]
+                stat = entry.stat()
+                used, size, paths = entries.get((kind_dir, key), (0, 0, []))
+                entries[(kind_dir, key)] = (max(used, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+    
+    # Oldest first, so both limits drop the least recently used entries
+    ordered = sorted(entries.values(), key=lambda e: e[0])
+    total = sum(size for _, size, _ in ordered)
+    cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+    limit = max_size_mb * 1024 * 1024 if max_size_mb is not None else None
+    
+    removed = 0
+    for used, size, paths in ordered:
+        expired = cutoff is not None and used < cutoff
+        if not expired and (limit is None or total <= limit):
+            break
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.warning(f"Could not remove cache file {path}: {e}")
+        total -= size
+        removed += 1
+    
+    log_event('cache', entries=len(ordered) - removed, removed=removed,
+              size_mb=round(total / (1024 * 1024), 1))
+    return removed
+
+class PageGeometryTable:
+    """Effective geometry of a run of pages, resolved once into compact parallel arrays.
+    
+    The visible box is the cropbox clipped to the mediabox, rotation is /Rotate
+    normalised to 0/90/180/270. display_size() is the upright size a viewer shows
+    (width/height swapped for 90/270) - the size a stamp must be rendered at -
+    and transformation() maps such a stamp onto the page's visible box.
+    """
+    def __init__(self, pages=()):
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.width = array('d')
+        self.height = array('d')
+        self.rotation = array('H')
+        for page in pages:
+            self.append(page)
+    
+    def __len__(self):
+        return len(self.rotation)
+    
+    def append(self, page):
+        media = page.mediabox
+        crop = page.cropbox
+        left = max(float(crop.left), float(media.left))
+        bottom = max(float(crop.bottom), float(media.bottom))
+        right = min(float(crop.right), float(media.right))
+        top = min(float(crop.top), float(media.top))
+        if right <= left or top <= bottom:
+            # Degenerate cropbox: fall back to the mediabox
+            left, bottom = float(media.left), float(media.bottom)
+            right, top = float(media.right), float(media.top)
+        
+        rotate = page['/Rotate'] if '/Rotate' in page else 0
+        self.x0.append(left)
+        self.y0.append(bottom)
+        self.width.append(right - left)
+        self.height.append(top - bottom)
+        self.rotation.append(int(round(float(rotate) / 90.0)) * 90 % 360)
+    
+    def display_size(self, i):
+        """Upright (width, height) of page i, rounded to 0.1pt so equal sizes share a stamp"""
+        w, h = self.width[i], self.height[i]
+        if self.rotation[i] in (90, 270):
+            w, h = h, w
+        return round(w, 1), round(h, 1)
+    
+    def transformation(self, i):
+        """Transformation from upright display space onto page i's user space"""
+        import PyPDF2
+        x0, y0, w, h = self.x0[i], self.y0[i], self.width[i], self.height[i]
+        # Content is rotated counter-clockwise by /Rotate so the viewer's clockwise
+        # rotation turns it upright; the offset moves the rotated box onto the cropbox
+        offsets = {0: (x0, y0), 90: (x0 + w, y0), 180: (x0 + w, y0 + h), 270: (x0, y0 + h)}
+        rotation = self.rotation[i]
+        transformation = PyPDF2.Transformation()
+        if rotation:
+            transformation = transformation.rotate(rotation)
+        return transformation.translate(*offsets[rotation])
+    
+    def visible_box(self, i):
+        """(left, bottom, right, top) of page i's visible area in user space"""
+        return (self.x0[i], self.y0[i], self.x0[i] + self.width[i], self.y0[i] + self.height[i])
+    
+    def place(self, stamp, i):
+        """Position a stamp rendered at display_size(i) onto page i (modifies and returns stamp)
+        
+        merge_page clips the merged page to its own trimbox *before* our transformation,
+        so the stamp's boxes are set to the page's visible box to keep clip and stamp together.
+        """
+        import PyPDF2
+        if self.rotation[i] or self.x0[i] or self.y0[i]:
+            stamp.add_transformation(self.transformation(i))
+        box = PyPDF2.generic.RectangleObject(self.visible_box(i))
+        stamp.mediabox = box
+        stamp.cropbox = box
+        stamp.trimbox = box
+        return stamp
+
+def _stamp_for(stamps, size, render):
+    """Fresh copy of the stamp for a display size; render(width, height) runs once per size"""
+    if size not in stamps:
+        stamps[size] = render(*size)
+    return copy(stamps[size])
+
+def _blank_page_like(page, geometry, i):
+    """Empty page with the same boxes and rotation as page, to merge stamp and content onto"""
+    import PyPDF2
+    final_page = PyPDF2.PageObject.create_blank_page(width=float(page.mediabox.width),
+                                                     height=float(page.mediabox.height))
+    final_page.mediabox = page.mediabox
+    final_page.cropbox = page.cropbox
+    if geometry.rotation[i]:
+        final_page[PyPDF2.generic.NameObject('/Rotate')] = PyPDF2.generic.NumberObject(geometry.rotation[i])
+    return final_page
+
 def _create_watermark_pdf_file(text="KOPIE", width=595.27, height=841.89):
     """Create a watermark PDF as a TEMP FILE on disk (not BytesIO).
     
@@ -213,6 +764,7 @@ def _create_watermark_pdf_file(text="KOPIE", width=595.27, height=841.89):
     page objects lose their backing stream when the function scope exits.
     Returns the path to the temp file.
     """
+    from reportlab.pdfgen import canvas
     with NamedTemporaryFile(suffix='_watermark.pdf', delete=False) as tmp:
         tmp_path = tmp.name
     
@@ -229,7 +781,7 @@ def _create_watermark_pdf_file(text="KOPIE", width=595.27, height=841.89):
     can.restoreState()
     can.save()
     
-    logging.info(f"Watermark PDF created at: {tmp_path}")
+    logging.debug("Watermark PDF created at: %s", tmp_path)
     return tmp_path
 
 def apply_global_watermark(pdf_path):
@@ -239,6 +791,7 @@ def apply_global_watermark(pdf_path):
     Uses a temp file on disk for the watermark to avoid BytesIO garbage collection issues.
     Creates a fresh copy of the watermark page for each merge to avoid PyPDF2 mutation.
     """
+    import PyPDF2
     try:
         reader = PyPDF2.PdfReader(pdf_path)
         total_pages = len(reader.pages)
@@ -248,16 +801,18 @@ def apply_global_watermark(pdf_path):
             logging.warning(f"Only {total_pages} pages - nothing to watermark (need at least 3)")
             return True
         
-        # Get page dimensions from first page
-        first_page = reader.pages[0]
-        w = float(first_page.mediabox.width)
-        h = float(first_page.mediabox.height)
-        
-        # Create the watermark as a real file on disk
-        wm_file_path = _create_watermark_pdf_file("KOPIE", w, h)
+        geometry = PageGeometryTable(reader.pages)
+        stamps = {}
         
-        # Keep the watermark reader alive in this scope
-        wm_reader = PyPDF2.PdfReader(wm_file_path)
+        def render(width, height):
+            # Render via a real file on disk (see _create_watermark_pdf_file)
+            wm_file_path = _create_watermark_pdf_file("KOPIE", width, height)
+            wm_reader = PyPDF2.PdfReader(wm_file_path)
+            try:
+                os.remove(wm_file_path)
+            except Exception:
+                pass
+            return wm_reader.pages[0]
         
         writer = PyPDF2.PdfWriter()
         watermarked_count = 0
@@ -266,12 +821,9 @@ def apply_global_watermark(pdf_path):
             if i >= 2:  # Page 3 onwards (Index 2)
                 # Create a FRESH COPY of watermark page for each merge
                 # (PyPDF2 can mutate page objects during merge_page)
-                wm_page_copy = copy(wm_reader.pages[0])
+                wm_page_copy = geometry.place(_stamp_for(stamps, geometry.display_size(i), render), i)
                 
-                page_w = float(page.mediabox.width)
-                page_h = float(page.mediabox.height)
-                final_page = PyPDF2.PageObject.create_blank_page(width=page_w, height=page_h)
-                final_page.mediabox = page.mediabox
+                final_page = _blank_page_like(page, geometry, i)
                 # Watermark as UNDERLAY (behind text)
                 final_page.merge_page(wm_page_copy)
                 final_page.merge_page(page)
@@ -285,12 +837,6 @@ def apply_global_watermark(pdf_path):
         with open(pdf_path, 'wb') as f:
             writer.write(f)
         
-        # Cleanup temp watermark file
-        try:
-            os.remove(wm_file_path)
-        except:
-            pass
-        
         logging.info(f"apply_global_watermark: SUCCESS - Watermarked {watermarked_count} pages (Page 3 to {total_pages})")
         return True
         
@@ -307,13 +853,13 @@ def should_skip_first_page_watermark(doc_type, pdf_path, page_obj):
     logging.debug(f"Watermark requested for all pages (doc_type: {doc_type})")
     return False
 
-def discover_files(input_dir):
-    logging.info(f"Searching for files in: {input_dir}")
+def discover_files(storage):
+    logging.info(f"Searching for files in: {storage.describe('input')}")
     files_by_type = {t: [] for t in CONFIG['document_types']}
-    if not os.path.exists(input_dir):
-        return {}
     
-    files = sorted(glob.glob(os.path.join(input_dir, '*')))
+    files = storage.list_files('input')
+    if not files:
+        return {}
     matched_paths = set()
 
     for doc_type in DISCOVERY_ORDER:
@@ -332,9 +878,161 @@ def discover_files(input_dir):
                 if not any(e.lower() in normalized_filename for e in excludes):
                     files_by_type[doc_type].append(file_path)
                     matched_paths.add(file_path)
-                    logging.info(f"Matched {doc_type}: {os.path.basename(file_path)}")
+                    logging.debug("Matched %s: %s", doc_type, os.path.basename(file_path))
+    
+    found = {k: v for k, v in files_by_type.items() if v}
+    log_event('discovery', files=len(matched_paths), unmatched=len(files) - len(matched_paths),
+              types={k: len(v) for k, v in found.items()})
+    return found
+
+def _hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def deduplicate_files(found_files):
+    """Collapse byte-identical input documents after discovery.
+    
+    Files are grouped by size first so only size collisions get hashed.
+    Of each identical group the copy in the highest-priority section is kept
+    (shortest filename within a section); the others are logged and moved
+    to processed/ with the configured marker.
+    """
+    dedup_cfg = CONFIG.get('dedup', {})
+    if not dedup_cfg.get('enabled', False):
+        return found_files
+    
+    ordered = [(dt, p) for dt in DISCOVERY_ORDER for p in found_files.get(dt, [])]
+    by_size = {}
+    for _, file_path in ordered:
+        try:
+            by_size.setdefault(os.path.getsize(file_path), []).append(file_path)
+        except OSError as e:
+            logging.warning(f"Dedup: cannot stat {file_path}: {e}")
+    
+    by_hash = {}
+    for position, (doc_type, file_path) in enumerate(ordered):
+        try:
+            if len(by_size.get(os.path.getsize(file_path), [])) < 2:
+                continue
+            by_hash.setdefault(_hash_file(file_path), []).append((position, doc_type, file_path))
+        except OSError as e:
+            logging.warning(f"Dedup: cannot hash {file_path}: {e}")
+    
+    duplicates = set()
+    for group in by_hash.values():
+        # The copy in the highest-priority section wins ('KSt Erklärung.pdf' over an
+        # identical 'Beleg.pdf'); within a section the shortest name ('Beleg 1.pdf'
+        # over 'Beleg 1 (1).pdf'), then discovery order
+        _, _, original = min(group, key=lambda entry: (DISCOVERY_ORDER.index(entry[1]),
+                                                       len(os.path.basename(entry[2])),
+                                                       entry[0]))
+        for _, _, file_path in group:
+            if file_path == original:
+                continue
+            duplicates.add(file_path)
+            logging.warning(f"Duplicate input: {os.path.basename(file_path)} is identical to {os.path.basename(original)}")
+            move_file_to_processed(file_path, marker=dedup_cfg.get('marker', 'DUPLICATE'))
+    
+    log_event('dedup', hashed=sum(len(group) for group in by_hash.values()), duplicates=len(duplicates))
+    
+    deduped = {}
+    for doc_type, files in found_files.items():
+        kept = [p for p in files if p not in duplicates]
+        if kept:
+            deduped[doc_type] = kept
+    return deduped
+
+def _hash_pdf_object(obj, digest, seen):
+    """Feed a PDF object graph (dicts, arrays, streams) into a hash digest.
+    
+    Indirect references are followed once; '/Parent' and '/P' back-links are
+    skipped so a page hash covers only the page itself, not the whole tree.
+    """
+    import PyPDF2
+    if isinstance(obj, PyPDF2.generic.IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in seen:
+            digest.update(b'<ref>')
+            return
+        seen.add(ref)
+        obj = obj.get_object()
+    
+    if isinstance(obj, PyPDF2.generic.StreamObject):
+        digest.update(obj.get_data())
+    if isinstance(obj, dict):
+        for key, value in sorted(obj.items()):
+            if key in ('/Parent', '/P'):
+                continue
+            digest.update(str(key).encode('utf-8'))
+            _hash_pdf_object(value, digest, seen)
+    elif isinstance(obj, list):
+        for value in obj:
+            _hash_pdf_object(value, digest, seen)
+    elif not isinstance(obj, PyPDF2.generic.StreamObject):
+        digest.update(repr(obj).encode('utf-8'))
+
+def _page_fingerprint(page):
+    """Content hash of a single page (content streams, resources, boxes)"""
+    digest = hashlib.sha256()
+    _hash_pdf_object(page, digest, set())
+    return digest.hexdigest()
+
+def dedupe_section_pages(section_pdf, doc_type):
+    """Drop pages that are identical to an earlier page of the same section.
+    
+    Returns the original path when nothing was dropped, otherwise a temp file.
+    """
+    import PyPDF2
+    try:
+        reader = PyPDF2.PdfReader(section_pdf)
+        writer = PyPDF2.PdfWriter()
+        seen = set()
+        dropped = 0
+        
+        for i, page in enumerate(reader.pages):
+            fingerprint = _page_fingerprint(page)
+            if fingerprint in seen:
+                dropped += 1
+                logging.debug("Dedup %s: dropping duplicate page %d", doc_type, i + 1)
+                continue
+            seen.add(fingerprint)
+            writer.add_page(page)
+        
+        if not dropped:
+            return section_pdf
         
-    return {k: v for k, v in files_by_type.items() if v}
+        with NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+            writer.write(tmp)
+        logging.info(f"Dedup {doc_type}: removed {dropped} duplicate page(s)")
+        return tmp.name
+    except Exception as e:
+        logging.warning(f"Page dedup failed for {doc_type}, keeping section as-is: {e}")
+        return section_pdf
+
+# docx2pdf drives a single Word instance over COM, so conversions are serialised
+_CONVERT_LOCK = threading.Lock()
+
+def _convert_docx(file_path, pdf_path):
+    """Run docx2pdf, initialising COM when called from a worker thread"""
+    with _CONVERT_LOCK:
+        com = None
+        if sys.platform == 'win32' and threading.current_thread() is not threading.main_thread():
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+                com = pythoncom
+            except ImportError:
+                pass
+        try:
+            from docx2pdf import convert
+            convert(file_path, pdf_path)
+        finally:
+            if com is not None:
+                com.CoUninitialize()
 
 def convert_to_pdf(file_path):
     if not file_path.lower().endswith('.docx'):
@@ -343,7 +1041,7 @@ def convert_to_pdf(file_path):
         with NamedTemporaryFile(suffix='.pdf', delete=False) as temp_pdf:
             temp_pdf_path = temp_pdf.name
         logging.info(f"Converting {os.path.basename(file_path)}...")
-        convert(file_path, temp_pdf_path)
+        _convert_docx(file_path, temp_pdf_path)
         return temp_pdf_path
     except Exception as e:
         logging.error(f"Conversion failed for {file_path}: {e}")
@@ -355,6 +1053,7 @@ def apply_watermark(pdf_path, doc_type):
     """Apply section-specific file-based watermarks (logos/headers) ONLY for
     anschreiben and deckblatt. All other sections skip per-section watermarks;
     they receive the global diagonal 'KOPIE' watermark after merging."""
+    import PyPDF2
     watermark_file = CONFIG['document_types'][doc_type].get('watermark')
     
     # Only apply file-based logo watermarks for Cover Letter and Cover Page.
@@ -379,14 +1078,13 @@ def apply_watermark(pdf_path, doc_type):
         writer = PyPDF2.PdfWriter()
         wm_reader = PyPDF2.PdfReader(watermark_path)
         wm_page = wm_reader.pages[0]
+        geometry = PageGeometryTable(reader.pages)
         
         for i, page in enumerate(reader.pages):
-            w, h = float(page.mediabox.width), float(page.mediabox.height)
-            final_page = PyPDF2.PageObject.create_blank_page(width=w, height=h)
-            final_page.mediabox = page.mediabox
+            final_page = _blank_page_like(page, geometry, i)
             
-            # File-based watermarks (logos) go in the background
-            final_page.merge_page(wm_page)
+            # File-based watermarks (logos) go in the background, upright on the visible area
+            final_page.merge_page(geometry.place(copy(wm_page), i))
             final_page.merge_page(page)
             writer.add_page(final_page)
             
@@ -404,6 +1102,7 @@ def apply_special_watermark(pdf_path, doc_type):
     - First page: Wasserzeichen Deckblatt.pdf (cover sheet watermark)
     - Subsequent pages: Wasserzeichen Allgemein.pdf (as requested)
     """
+    import PyPDF2
     wm_deckblatt_path = os.path.join(CONFIG['watermark_dir'], 'Wasserzeichen Deckblatt.pdf')
     wm_allgemein_path = os.path.join(CONFIG['watermark_dir'], 'Wasserzeichen Allgemein.pdf')
     
@@ -438,38 +1137,42 @@ def apply_special_watermark(pdf_path, doc_type):
             
             page_count = len(reader.pages)
             logging.debug(f"  Processing {page_count} pages (P1=Deckblatt, P2+=Allgemein)...")
+            
+            geometry = PageGeometryTable(reader.pages)
+            stamps = {}
+            
+            def render(width, height):
+                # Create via temp file to avoid BytesIO GC issues
+                _tmp_wm = _create_watermark_pdf_file("KOPIE", width, height)
+                _tmp_wm_reader = PyPDF2.PdfReader(_tmp_wm)
+                try: os.remove(_tmp_wm)
+                except: pass
+                return _tmp_wm_reader.pages[0]
 
             for i, page in enumerate(reader.pages):
                 try:
-                    w, h = float(page.mediabox.width), float(page.mediabox.height)
+                    w, h = geometry.display_size(i)
                     
                     # Choose watermark
                     wm_type = "Deckblatt" if i == 0 else "Allgemein"
                     
                     if wm_type == "Allgemein":
-                        # Dynamic diagonal watermark for subsequent pages
-                        # Create via temp file to avoid BytesIO GC issues
-                        _tmp_wm = _create_watermark_pdf_file("KOPIE", w, h)
-                        _tmp_wm_reader = PyPDF2.PdfReader(_tmp_wm)
-                        wm_to_merge = copy(_tmp_wm_reader.pages[0])
-                        try: os.remove(_tmp_wm)
-                        except: pass
+                        # Dynamic diagonal watermark for subsequent pages, rendered once per page size
+                        wm_to_merge = _stamp_for(stamps, (w, h), render)
                         is_dynamic_spec = True
                     else:
-                        # Deckblatt file-based watermark
+                        # Deckblatt file-based watermark, scaled to the upright visible area
                         is_dynamic_spec = False
                         wm_to_use = wm_d_page
                         wm_w_spec, wm_h_spec = float(wm_to_use.mediabox.width), float(wm_to_use.mediabox.height)
                         scale = min(w / wm_w_spec, h / wm_h_spec)
-                        off_x = float(page.mediabox.left) + (w - wm_w_spec * scale) / 2
-                        off_y = float(page.mediabox.bottom)
-                        trans = PyPDF2.Transformation().scale(scale).translate(off_x, off_y)
+                        off_x = (w - wm_w_spec * scale) / 2
+                        trans = PyPDF2.Transformation().scale(scale).translate(off_x, 0)
                         wm_to_merge = copy(wm_to_use)
                         wm_to_merge.add_transformation(trans)
+                    wm_to_merge = geometry.place(wm_to_merge, i)
                     
-                    final_page = PyPDF2.PageObject.create_blank_page(width=w, height=h)
-                    final_page.mediabox = page.mediabox
-                    final_page.cropbox = page.cropbox
+                    final_page = _blank_page_like(page, geometry, i)
                     
                     if is_dynamic_spec:
                         # Dynamic diagonal KOPIE: OVERLAY (content first, watermark on top)
@@ -500,10 +1203,12 @@ def apply_special_watermark(pdf_path, doc_type):
         logging.error(f"   Error details: {str(e)}")
         return None
 
-def get_watermark_page(page):
-    """Generate dynamic KOPIE watermark matching page size exactly."""
-    pw = float(page.mediabox.width)
-    ph = float(page.mediabox.height)
+def _render_watermark_file(pw, ph):
+    """Render the dynamic KOPIE watermark for an upright (display) page size to a temp file.
+    
+    Returns the path; the caller removes the file when done.
+    """
+    from reportlab.pdfgen import canvas
     
     with NamedTemporaryFile(suffix='_watermark.pdf', delete=False) as tmp:
         tmp_path = tmp.name
@@ -521,7 +1226,15 @@ def get_watermark_page(page):
     can.drawCentredString(0, 0, "KOPIE")
     can.restoreState()
     can.save()
+    return tmp_path
+
+def get_watermark_page(pw, ph):
+    """Generate dynamic KOPIE watermark for an upright (display) page size.
     
+    Callers position it with PageGeometryTable.place() and reuse it per size.
+    """
+    import PyPDF2
+    tmp_path = _render_watermark_file(pw, ph)
     wm_reader = PyPDF2.PdfReader(tmp_path)
     wm_page = copy(wm_reader.pages[0])
     
@@ -532,8 +1245,69 @@ def get_watermark_page(page):
         
     return wm_page
 
-def merge_pdfs_strict(processed_files):
-    """Merge documents in strict sequence with Hybrid Z-Order Watermarking."""
+def _stamp_page(page, page_index, geometry, i, stamps):
+    """Return a new page with the KOPIE watermark merged under or over the content.
+    
+    geometry[i] is the page's resolved geometry; stamps holds one rendered
+    watermark per distinct display size, shared across the whole merge.
+    """
+    final_page = _blank_page_like(page, geometry, i)
+    watermark_page = geometry.place(_stamp_for(stamps, geometry.display_size(i), get_watermark_page), i)
+    
+    if page_index == 0:
+        # Page 1 (Cover Letter / Anschreiben)
+        # Apply watermark as UNDERLAY — merge watermark first, then content on top
+        final_page.merge_page(watermark_page)
+        final_page.merge_page(page)
+        logging.debug("    Page %d: UNDERLAY KOPIE (Cover Letter)", page_index + 1)
+    else:
+        # Page 2+ (Cover Page, Tax Forms, Calculations, etc.)
+        # Apply watermark as OVERLAY — merge watermark on top of content
+        final_page.merge_page(page)
+        final_page.merge_page(watermark_page)
+        log_sampled(page_index, "    Page %d: OVERLAY KOPIE", page_index + 1)
+    
+    return final_page
+
+def stamp_section(pdf_path, first_page_index, stamp_files, stamp_key=None):
+    """Watermark every page of one section; runs in a section worker process.
+    
+    first_page_index is the section's page offset in the final document (page 0
+    gets the underlay stamp). stamp_files maps display size -> watermark file
+    rendered once by merge_pdfs_strict; sizes missing from it are rendered here.
+    With a stamp_key the result is also written to the stamped-section cache.
+    Returns (stamped_path, renders); stamped_path is a temp file unless it went
+    into the cache.
+    """
+    import PyPDF2
+    stamps = {size: PyPDF2.PdfReader(path).pages[0] for size, path in stamp_files.items()}
+    
+    reader = PyPDF2.PdfReader(pdf_path)
+    geometry = PageGeometryTable(reader.pages)
+    section_writer = PyPDF2.PdfWriter()
+    for offset, page in enumerate(reader.pages):
+        section_writer.add_page(_stamp_page(page, first_page_index + offset, geometry, offset, stamps))
+    with NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        section_writer.write(tmp)
+    renders = len(stamps) - len(stamp_files)
+    
+    if stamp_key:
+        cached = store_cached('stamped', stamp_key, tmp.name)
+        if cached != tmp.name:
+            os.remove(tmp.name)
+            return cached, renders
+    return tmp.name, renders
+
+def merge_pdfs_strict(processed_files, section_keys=None):
+    """Merge documents in strict sequence with Hybrid Z-Order Watermarking.
+    
+    Sections are stamped independently (in the section pool when there is one)
+    and concatenated here in merge order. The KOPIE stamp is rendered once per
+    distinct display size for the whole merge. section_keys maps doc_type ->
+    section cache key. Sections with a key reuse (or populate) the stamped-section
+    cache instead of re-stamping every page.
+    """
+    import PyPDF2
     logging.info("=" * 60)
     logging.info("MERGE START: Building final document with hybrid Z-order watermarks")
     logging.info("=" * 60)
@@ -547,52 +1321,398 @@ def merge_pdfs_strict(processed_files):
     if not ordered_pdfs:
         logging.error("No documents to merge!")
         return None
-        
-    output_writer = PyPDF2.PdfWriter()
-    all_pages = []
     
+    section_keys = section_keys or {}
+    cache_cfg = CONFIG['section_cache']
+    use_stamp_cache = cache_cfg.get('enabled') and cache_cfg.get('stamped')
+    
+    # Page offsets, cache hits and stamp sizes first: only the section that starts
+    # the document is stamped differently
+    sections = []
+    sizes = set()
+    page_index = 0
     for doc_type, pdf_path in ordered_pdfs:
         try:
             reader = PyPDF2.PdfReader(pdf_path)
-            all_pages.extend(reader.pages)
+            page_count = len(reader.pages)
         except Exception as e:
             logging.error(f"  ERROR processing {doc_type}: {e}", exc_info=True)
-            
-    for page_index, page in enumerate(all_pages):
-        pw = float(page.mediabox.width)
-        ph = float(page.mediabox.height)
-        final_page = PyPDF2.PageObject.create_blank_page(width=pw, height=ph)
-        final_page.mediabox = page.mediabox
-        
-        watermark_page = get_watermark_page(page)
-        
-        if page_index == 0:
-            # Page 1 (Cover Letter / Anschreiben)
-            # Apply watermark as UNDERLAY — merge watermark first, then content on top
-            final_page.merge_page(watermark_page)
-            final_page.merge_page(page)
-            logging.info(f"    Page {page_index + 1}: UNDERLAY KOPIE (Cover Letter)")
+            continue
+        # Stamping depends only on the section content and whether it starts the document
+        stamp_key = None
+        if use_stamp_cache and doc_type in section_keys:
+            position = 'first' if page_index == 0 else 'rest'
+            stamp_key = f"{section_keys[doc_type]}_{position}"
+        cached = load_cached('stamped', stamp_key) if stamp_key else None
+        if not cached:
+            geometry = PageGeometryTable(reader.pages)
+            sizes.update(geometry.display_size(i) for i in range(page_count))
+        sections.append((doc_type, pdf_path, page_index, stamp_key, page_count, cached))
+        page_index += page_count
+    
+    stamp_files = {size: _render_watermark_file(*size) for size in sorted(sizes)}
+    stamp_renders = len(stamp_files)
+    temp_files = list(stamp_files.values())
+    
+    pool = get_section_pool(sum(count for *_, count, cached in sections if not cached))
+    futures = {}
+    if pool is not None:
+        for n, (_, pdf_path, first, stamp_key, _, cached) in enumerate(sections):
+            if not cached:
+                futures[n] = pool.submit(stamp_section, pdf_path, first, stamp_files, stamp_key)
+    
+    output_writer = PyPDF2.PdfWriter()
+    stamped_from_cache = 0
+    page_index = 0
+    
+    for n, (doc_type, pdf_path, first, stamp_key, page_count, cached) in enumerate(sections):
+        if cached:
+            logging.info(f"  {doc_type}: reusing cached stamped pages")
+            stamped_from_cache += page_count
+            stamped_path = cached
         else:
-            # Page 2+ (Cover Page, Tax Forms, Calculations, etc.)
-            # Apply watermark as OVERLAY — merge watermark on top of content
-            final_page.merge_page(page)
-            final_page.merge_page(watermark_page)
-            logging.info(f"    Page {page_index + 1}: OVERLAY KOPIE")
-            
-        output_writer.add_page(final_page)
+            try:
+                if n in futures:
+                    stamped_path, renders = futures[n].result()
+                else:
+                    stamped_path, renders = stamp_section(pdf_path, first, stamp_files, stamp_key)
+            except Exception as e:
+                logging.error(f"  ERROR processing {doc_type}: {e}", exc_info=True)
+                continue
+            stamp_renders += renders
+            if not stamped_path.startswith(CONFIG['cache_dir'] + os.sep):
+                # Not cached (disabled or write failed): a temp file to remove after the merge
+                temp_files.append(stamped_path)
+        
+        for page in PyPDF2.PdfReader(stamped_path).pages:
+            output_writer.add_page(page)
+        page_index += page_count
 
-    output_path = os.path.join(CONFIG['output_dir'], 'final_output.pdf')
+    storage = get_storage()
+    output_path = storage.output_path('final_output.pdf')
     with open(output_path, 'wb') as f:
         output_writer.write(f)
+    output_path = storage.publish(output_path, 'output')
+    for path in temp_files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
     
     logging.info("=" * 60)
-    logging.info(f"MERGE COMPLETE: {len(all_pages)} total pages")
+    logging.info(f"MERGE COMPLETE: {page_index} total pages")
     logging.info(f"  Output: {output_path}")
     logging.info("=" * 60)
+    log_event('merge', sections=len(sections), pages=page_index,
+              stamped=page_index - stamped_from_cache, stamped_from_cache=stamped_from_cache,
+              distinct_stamps=len(sizes), stamp_renders=stamp_renders)
     
     return output_path
 
+TAX_FORM_TYPES = ['kst', 'est', 'ust']
+
+def split_tax_form(doc_type, sources):
+    """Split tax forms with > 2 pages: P1-2 -> Calculations, P3+ stay in the form section.
+    
+    Returns (form_paths, calc_parts).
+    """
+    import PyPDF2
+    form_paths = []
+    calc_parts = []
+    for p in sources:
+        pdf_p = convert_to_pdf(p)
+        if not pdf_p: 
+            continue
+        
+        try:
+            reader = PyPDF2.PdfReader(pdf_p)
+            # Split forms with > 2 pages: first 2 go to Calculations, rest stay in specialized form bucket
+            if len(reader.pages) > 2:
+                logging.info(f"Splitting {os.path.basename(p)}: P1-2 -> Calculations, P3+ -> Form")
+                
+                # Part 1: Calculations (P1-2)
+                p12_writer = PyPDF2.PdfWriter()
+                p12_writer.add_page(reader.pages[0])
+                p12_writer.add_page(reader.pages[1])
+                with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
+                    p12_writer.write(t)
+                    calc_parts.append(t.name)
+                
+                # Part 2: Form (P3+)
+                form_writer = PyPDF2.PdfWriter()
+                for i in range(2, len(reader.pages)):
+                    form_writer.add_page(reader.pages[i])
+                with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
+                    form_writer.write(t)
+                    form_paths.append(t.name)
+            else:
+                form_paths.append(pdf_p)
+        except Exception as e:
+            logging.warning(f"Failed to split tax form {p}: {e}")
+            form_paths.append(pdf_p)
+    
+    return form_paths, calc_parts
+
+def assemble_budgeted_section(dt, sources, budget):
+    """Fill a section's page budget from as few sources as possible.
+    
+    Sources are converted and opened in order only until 'budget' pages are
+    collected, and only those pages are written. Returns (section_pdf, sources_used);
+    section_pdf is None if no source yielded a page.
+    """
+    import PyPDF2
+    logging.info(f"Enforcing {budget}-page budget for {dt}")
+    writer = PyPDF2.PdfWriter()
+    taken = 0
+    used = 0
+    
+    for p in sources:
+        if taken >= budget:
+            break
+        used += 1
+        pdf_path = convert_to_pdf(p)
+        if not pdf_path:
+            logging.warning(f"Skipping {os.path.basename(p)} due to conversion error")
+            continue
+        reader = PyPDF2.PdfReader(pdf_path)
+        for i in range(min(len(reader.pages), budget - taken)):
+            writer.add_page(reader.pages[i])
+            taken += 1
+    
+    if not taken:
+        return None, used
+    
+    with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
+        writer.write(t)
+    return t.name, used
+
+def report_unused_sources(dt, unused):
+    """Log sources that did not contribute to a budgeted section and set them aside
+    
+    Only original input files are moved (temp files from splitting are left alone).
+    """
+    storage = get_storage()
+    for p in unused:
+        logging.warning(f"Unused {dt} source (page budget already filled): {os.path.basename(p)}")
+        if storage.is_input(p):
+            move_file_to_processed(p, marker=CONFIG['unused_marker'])
+
+def build_section(dt, sources):
+    """Convert and merge the sources of one document type into a section PDF.
+    
+    Types with a 'page_budget' only open as many sources as needed to fill it.
+    Returns (section_pdf, cache_key, from_cache, unused_sources), or None if the
+    section failed. Unused sources are reported by the caller (report_unused_sources),
+    so this can run in a worker process. Files that fail conversion are routed to the error folder by
+    convert_to_pdf.
+    """
+    import PyPDF2
+    try:
+        budget = CONFIG['document_types'][dt].get('page_budget')
+        cache_key = None
+        # Reuse the section from a previous run if none of its inputs changed
+        if CONFIG['section_cache'].get('enabled'):
+            try:
+                cache_key = section_cache_key(dt, sources)
+            except OSError as e:
+                logging.warning(f"Cannot hash inputs for {dt}, building without cache: {e}")
+            cached_section = load_cached('sections', cache_key) if cache_key else None
+            if cached_section:
+                logging.info(f"Cache hit for {dt}: skipping conversion and merge")
+                used = load_cached_meta('sections', cache_key).get('sources_used', len(sources))
+                return cached_section, cache_key, True, list(sources[used:])
+        
+        try:
+            if budget:
+                section_pdf, used = assemble_budgeted_section(dt, sources, budget)
+                if not section_pdf:
+                    return None
+            else:
+                type_pdfs = []
+                for p in sources:
+                    pdf_path = convert_to_pdf(p)
+                    if pdf_path: 
+                        type_pdfs.append(pdf_path)
+                    else:
+                        logging.warning(f"Skipping {os.path.basename(p)} due to conversion error")
+                
+                if not type_pdfs: 
+                    return None
+                
+                # MERGE ALL FILES OF THIS TYPE
+                merger = PyPDF2.PdfMerger()
+                for pdf in type_pdfs: 
+                    merger.append(pdf)
+                
+                with NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+                    merger.write(tmp)
+                    section_pdf = tmp.name
+                used = len(sources)
+                
+                if CONFIG['dedup'].get('per_page'):
+                    section_pdf = dedupe_section_pages(section_pdf, dt)
+            
+            unused = list(sources[used:])
+                    
+            # Watermarking is now handled purely during strict merge phase
+            if cache_key:
+                section_pdf = store_cached('sections', cache_key, section_pdf,
+                                           meta={'sources_used': used, 'sources_total': len(sources)})
+            return section_pdf, cache_key, False, unused
+        except Exception as e:
+            logging.error(f"Error processing document type {dt}: {e}")
+            return None
+    except Exception as e:
+        logging.error(f"Unexpected error processing {dt}: {e}")
+        return None
+
+def build_section_graph(found_files):
+    """Describe section assembly as tasks plus dependencies for run_task_graph.
+    
+    Each task is (func, doc_type, sources_fn): func(doc_type, sources) is called with
+    sources_fn(done), computed from the results of the task's dependencies.
+    Each tax form is split in its own task; its form section waits for that split,
+    and 'berechnungen' waits for all splits because it collects their P1-2 parts.
+    Every other section is independent.
+    """
+    tasks = {}
+    dependencies = {}
+    split_names = []
+    
+    for dt in TAX_FORM_TYPES:
+        if dt in found_files:
+            name = f"split:{dt}"
+            tasks[name] = (split_tax_form, dt, lambda done, dt=dt: found_files[dt])
+            split_names.append(name)
+    
+    def section_sources(dt, done):
+        if dt in TAX_FORM_TYPES:
+            return (done.get(f"split:{dt}") or ([], []))[0]
+        sources = list(found_files.get(dt, []))
+        if dt == 'berechnungen':
+            # Append split parts to existing calculations
+            for name in split_names:
+                sources.extend((done.get(name) or ([], []))[1])
+        return sources
+    
+    for dt in CONFIG['merge_order']:
+        if dt in TAX_FORM_TYPES and dt in found_files:
+            dependencies[f"section:{dt}"] = [f"split:{dt}"]
+        elif dt == 'berechnungen' and split_names:
+            dependencies[f"section:{dt}"] = list(split_names)
+        elif dt not in found_files:
+            continue
+        tasks[f"section:{dt}"] = (build_section, dt, lambda done, dt=dt: section_sources(dt, done))
+    
+    return tasks, dependencies
+
+def _init_section_worker(config, log_mode, log_level):
+    """Worker process setup: same CONFIG and console logging as the parent.
+    
+    Records logged in workers are not included in the parent's 'run' log_lines count.
+    """
+    CONFIG.update(config)
+    configure_logging(log_mode)
+    logging.getLogger().setLevel(log_level)
+
+_SECTION_POOL = None
+
+def get_section_pool(pages):
+    """Process pool for `pages` pages of PDF work (created once), or None to work in-process.
+    
+    PyPDF2 parsing, stamping and writing is pure Python, so threads would serialise
+    on the GIL. CONFIG['section_workers'] None means one worker per CPU (max 4).
+    A pool is only started for at least CONFIG['section_pool_min_pages'] pages;
+    once started, later stages reuse it.
+    """
+    global _SECTION_POOL
+    workers = CONFIG['section_workers']
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+    if _SECTION_POOL is None and workers > 1 and pages >= CONFIG['section_pool_min_pages']:
+        # 'spawn' everywhere: forking a process that runs threads is unsafe, and it
+        # matches the Windows/PyInstaller behaviour
+        _SECTION_POOL = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_section_worker,
+            initargs=(CONFIG, CONFIG['logging']['mode'], logging.getLogger().level))
+    return _SECTION_POOL
+
+def shutdown_section_pool():
+    global _SECTION_POOL
+    if _SECTION_POOL is not None:
+        _SECTION_POOL.shutdown()
+        _SECTION_POOL = None
+
+def count_pdf_pages(paths):
+    """Total pages of the given PDFs; unreadable files count as 0"""
+    import PyPDF2
+    total = 0
+    for path in paths:
+        try:
+            total += len(PyPDF2.PdfReader(path).pages)
+        except Exception:
+            pass
+    return total
+
+def run_task_graph(tasks, dependencies, process_pool=None):
+    """Run tasks as soon as their dependencies have finished.
+    
+    Tasks whose sources are all PDFs go to process_pool. Tasks with DOCX
+    sources run on a single in-process thread, since docx2pdf drives one Word
+    instance over COM. Without a pool, everything runs on that thread.
+    A task that raises is logged and recorded as None so its dependents still
+    run (with empty input).
+    """
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    
+    with ThreadPoolExecutor(max_workers=1) as local_pool:
+        while pending or running:
+            ready = [name for name in pending
+                     if all(dep in results for dep in dependencies.get(name, ()))]
+            for name in ready:
+                func, doc_type, sources_fn = pending.pop(name)
+                sources = sources_fn(dict(results))
+                needs_local = process_pool is None or any(p.lower().endswith('.docx') for p in sources)
+                pool = local_pool if needs_local else process_pool
+                running[pool.submit(func, doc_type, sources)] = name
+            
+            if not running:
+                for name in pending:
+                    logging.error(f"Task {name} has unresolvable dependencies: {dependencies.get(name)}")
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logging.error(f"Task {name} failed: {e}", exc_info=True)
+                    results[name] = None
+    
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="German Tax Automation - Document Processor")
+    parser.add_argument('--version', action='version', version=f"%(prog)s {__version__}")
+    parser.add_argument('--log-mode', choices=LOG_MODES,
+                        default=os.environ.get('DOC_PROCESSOR_LOG_MODE', CONFIG['logging']['mode']),
+                        help="console logging mode (default: text)")
+    parser.add_argument('--quiet', action='store_true', help="shortcut for --log-mode quiet")
+    parser.add_argument('--verbose', action='store_true', help="include sampled per-page debug detail")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    # Section worker processes re-enter here in the frozen exe
+    multiprocessing.freeze_support()
+    run_started = time.perf_counter()
+    # Parsed before the main try so --help/--version exit without a 'run' event
+    args = parse_args()
+    # Console banners and boxes are text mode only; json/quiet output stays log records
+    show_banner = True
     try:
         # Configure UTF-8 encoding for Windows console
         if hasattr(sys.stdout, 'reconfigure'):
@@ -603,175 +1723,105 @@ if __name__ == "__main__":
                 # Fallback if reconfigure is not available
                 pass
         
+        configure_logging('quiet' if args.quiet else args.log_mode, verbose=args.verbose)
+        show_banner = CONFIG['logging']['mode'] == 'text'
+        
         # Verify BASE_DIR is set correctly
-        print(f"\n{'='*70}")
-        print(f"German Tax Automation - Document Processor v2.0")
-        print(f"{'='*70}")
-        print(f"Running from: {os.getcwd()}")
-        print(f"Project root: {BASE_DIR}")
-        print(f"{'='*70}\n")
+        if show_banner:
+            print(f"\n{'='*70}")
+            print(f"German Tax Automation - Document Processor v{__version__}")
+            print(f"{'='*70}")
+            print(f"Running from: {os.getcwd()}")
+            print(f"Project root: {BASE_DIR}")
+            print(f"{'='*70}\n")
         
         # Create all necessary directories
         ensure_directories()
         
         # Discover files
         logging.info("Starting document processing...")
-        found_files = discover_files(CONFIG['input_dir'])
+        storage = get_storage()
+        found_files = discover_files(storage)
         if not found_files:
-            logging.warning("No files found in input directory.")
-            print(f"\n⚠ No documents found in: {CONFIG['input_dir']}")
-            print(f"   Please place tax documents in the Import Directory folder")
+            logging.warning(f"No files found in input directory: {storage.describe('input')}")
+            if show_banner:
+                print(f"\n⚠ No documents found in: {storage.describe('input')}")
+                print(f"   Please place tax documents in the Import Directory folder")
             sys.exit(0)
         
+        # Remote backends read ahead all matched inputs into local scratch
+        found_files = storage.prefetch(found_files)
+        
+        # Collapse byte-identical inputs before any conversion work
+        found_files = deduplicate_files(found_files)
+        
         logging.info(f"Found documents for {len(found_files)} types")
-        for doc_type, files in found_files.items():
-            print(f"  ✓ {doc_type}: {len(files)} file(s)")
+        if show_banner:
+            for doc_type, files in found_files.items():
+                print(f"  ✓ {doc_type}: {len(files)} file(s)")
         
         # PRE-PROCESS: Split Tax Form Calculations
         # This ensures the first 2 pages of tax forms are treated as calculation pages
         # as requested for the strict Calculations -> Tax Cover -> Forms sequence.
-        calc_parts = []
-        # Support splitting ALL tax forms found
-        tax_form_types = ['kst', 'est', 'ust']
+        # SECTION ASSEMBLY: independent sections build concurrently; sequence is
+        # enforced only by merge_pdfs_strict.
+        tasks, dependencies = build_section_graph(found_files)
+        pdf_sources = [p for files in found_files.values() for p in files if p.lower().endswith('.pdf')]
+        results = run_task_graph(tasks, dependencies, get_section_pool(count_pdf_pages(pdf_sources)))
         
-        for dt in tax_form_types:
-            if dt not in found_files: 
-                continue
-            
-            new_paths = []
-            for p in found_files[dt]:
-                pdf_p = convert_to_pdf(p)
-                if not pdf_p: 
-                    continue
-                
-                try:
-                    reader = PyPDF2.PdfReader(pdf_p)
-                    # Split forms with > 2 pages: first 2 go to Calculations, rest stay in specialized form bucket
-                    if len(reader.pages) > 2:
-                        logging.info(f"Splitting {os.path.basename(p)}: P1-2 -> Calculations, P3+ -> Form")
-                        
-                        # Part 1: Calculations (P1-2)
-                        p12_writer = PyPDF2.PdfWriter()
-                        p12_writer.add_page(reader.pages[0])
-                        p12_writer.add_page(reader.pages[1])
-                        with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
-                            p12_writer.write(t)
-                            calc_parts.append(t.name)
-                        
-                        # Part 2: Form (P3+)
-                        form_writer = PyPDF2.PdfWriter()
-                        for i in range(2, len(reader.pages)):
-                            form_writer.add_page(reader.pages[i])
-                        with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
-                            form_writer.write(t)
-                            new_paths.append(t.name)
-                    else:
-                        new_paths.append(pdf_p)
-                except Exception as e:
-                    logging.warning(f"Failed to split tax form {p}: {e}")
-                    new_paths.append(pdf_p)
-            
-            found_files[dt] = new_paths
-            
-        # Add split calc parts to berechnungen
-        if calc_parts:
-            if 'berechnungen' not in found_files:
-                found_files['berechnungen'] = []
-            # Append split parts to existing calculations
-            found_files['berechnungen'].extend(calc_parts)
-
-        # STRICT SEQUENCING: Ensure Calculations are exactly 2 pages if possible, or at least log clearly
-        # Actually, the requirement says P2-3 should be calculations.
-        # If there are original calculations AND split parts, we'll keep them all in 'berechnungen'.
-
         processed_files = {}
+        section_keys = {}
+        sections_from_cache = 0
+        unused_sources = 0
         for dt in CONFIG['merge_order']:
-            if dt not in found_files: 
-                continue
-            
-            try:
-                type_pdfs = []
-                for p in found_files[dt]:
-                    pdf_path = convert_to_pdf(p)
-                    if pdf_path: 
-                        type_pdfs.append(pdf_path)
-                    else:
-                        logging.warning(f"Skipping {os.path.basename(p)} due to conversion error")
-                
-                if not type_pdfs: 
-                    continue
-                
-                if not type_pdfs: 
-                    continue
-                
-                try:
-                    # MERGE ALL FILES OF THIS TYPE
-                    merger = PyPDF2.PdfMerger()
-                    for pdf in type_pdfs: 
-                        merger.append(pdf)
-                    
-                    with NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
-                        merger.write(tmp)
-                        section_pdf = tmp.name
-                    
-                    # ENFORCE STRICT PAGINATION TO LOCK SEQUENCE
-                    if dt == 'anschreiben':
-                        # Cover Letter MUST be exactly 1 page (Page 1) 
-                        logging.info(f"Enforcing 1-page limit for {dt} (Anschreiben)")
-                        reader = PyPDF2.PdfReader(section_pdf)
-                        writer = PyPDF2.PdfWriter()
-                        writer.add_page(reader.pages[0])
-                        with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
-                            writer.write(t)
-                            section_pdf = t.name
-                            
-                    elif dt == 'deckblatt':
-                        # Cover Page MUST be exactly 1 page (Page 2)
-                        logging.info(f"Enforcing 1-page limit for {dt} (Cover Page)")
-                        reader = PyPDF2.PdfReader(section_pdf)
-                        writer = PyPDF2.PdfWriter()
-                        writer.add_page(reader.pages[0])
-                        with NamedTemporaryFile(suffix='.pdf', delete=False) as t:
-                            writer.write(t)
-                            section_pdf = t.name
-                            
-                    # Watermarking is now handled purely during strict merge phase
-                    processed_files[dt] = section_pdf
-                except Exception as e:
-                    logging.error(f"Error processing document type {dt}: {e}")
-                    continue
-            except Exception as e:
-                logging.error(f"Unexpected error processing {dt}: {e}")
+            built = results.get(f"section:{dt}")
+            if not built:
                 continue
+            section_pdf, cache_key, from_cache, unused = built
+            report_unused_sources(dt, unused)
+            unused_sources += len(unused)
+            processed_files[dt] = section_pdf
+            if cache_key:
+                section_keys[dt] = cache_key
+            if from_cache:
+                sections_from_cache += 1
         
         # warn about any found types that weren't processed
         for dt in found_files:
             if dt not in processed_files:
                 logging.warning(f"Document type '{dt}' was discovered but not included in final output")
+        log_event('sections', built=len(processed_files) - sections_from_cache, cached=sections_from_cache,
+                  failed=len([dt for dt in found_files if dt not in processed_files]),
+                  unused_sources=unused_sources)
         
         try:
-            final = merge_pdfs_strict(processed_files)
+            final = merge_pdfs_strict(processed_files, section_keys)
             if final: 
-                print(f"\n{'='*70}")
-                print(f"✓ SUCCESS - Final document created:")
-                print(f"   {final}")
-                print(f"{'='*70}\n")
+                if show_banner:
+                    print(f"\n{'='*70}")
+                    print(f"✓ SUCCESS - Final document created:")
+                    print(f"   {final}")
+                    print(f"{'='*70}\n")
                 logging.info(f"SUCCESS: Final output generated at {final}")
                 
                 # COMPREHENSIVE CLEANUP (Move ALL input files to processed)
                 try:
-                    input_dir = CONFIG['input_dir']
-                    # Move every file in input directory (catch-all approach)
-                    if os.path.isdir(input_dir):
-                        for item in os.listdir(input_dir):
-                            item_path = os.path.join(input_dir, item)
-                            # Skip subdirectories (processed/, error/) 
-                            if os.path.isdir(item_path):
-                                continue
-                            logging.info(f"Moving to processed: {item}")
-                            move_file_to_processed(item_path)
+                    moved_count = 0
+                    # Move every file in input directory (catch-all approach);
+                    # list_files skips subdirectories (processed/, error/)
+                    for item_path in storage.list_files('input'):
+                        logging.debug("Moving to processed: %s", os.path.basename(item_path))
+                        if move_file_to_processed(item_path):
+                            moved_count += 1
+                    log_event('cleanup', moved_to_processed=moved_count)
                 except Exception as _e:
                     logging.warning(f"Error moving remaining input files: {_e}")
+                
+                if CONFIG['section_cache'].get('enabled'):
+                    try:
+                        prune_cache()
+                    except Exception as _e:
+                        logging.warning(f"Error pruning section cache: {_e}")
 
                 # Final Absolute Purge
                 try:
@@ -806,29 +1856,36 @@ if __name__ == "__main__":
                 logging.error("FAILURE: Could not merge documents for final output")
         except Exception as e:
             logging.error(f"Error during final merge: {e}")
-            print(f"\n{'='*70}")
-            print(f"✗ Error creating final document: {e}")
-            print(f"   Check error folder: {CONFIG['error_dir']}")
-            print(f"{'='*70}\n")
+            if show_banner:
+                print(f"\n{'='*70}")
+                print(f"✗ Error creating final document: {e}")
+                print(f"   Check error folder: {storage.describe('error')}")
+                print(f"{'='*70}\n")
         
     except KeyError as e:
         logging.error(f"Configuration error - missing key: {e}")
-        print(f"\n✗ CONFIGURATION ERROR: {e}")
-        print(f"   The CONFIG dictionary may be corrupted")
+        if show_banner:
+            print(f"\n✗ CONFIGURATION ERROR: {e}")
+            print(f"   The CONFIG dictionary may be corrupted")
         safe_pause()
         sys.exit(1)
     except Exception as e:
         logging.error(f"CRITICAL ERROR: {e}", exc_info=True)
-        print(f"\n{'='*70}")
-        print(f"✗ CRITICAL ERROR OCCURRED")
-        print(f"{'='*70}")
-        print(f"Error: {e}")
-        print(f"\nPlease check:")
-        print(f"  1. Folder permissions (input/output/watermarks)")
-        print(f"  2. Disk space availability")
-        print(f"  3. Watermark PDF files exist in 'watermarks' folder")
-        print(f"  4. Document files in 'input/Import Directory' are readable")
-        print(f"\nReview the console output above for more details")
-        print(f"{'='*70}\n")
+        if show_banner:
+            print(f"\n{'='*70}")
+            print(f"✗ CRITICAL ERROR OCCURRED")
+            print(f"{'='*70}")
+            print(f"Error: {e}")
+            print(f"\nPlease check:")
+            print(f"  1. Folder permissions (input/output/watermarks)")
+            print(f"  2. Disk space availability")
+            print(f"  3. Watermark PDF files exist in 'watermarks' folder")
+            print(f"  4. Document files in 'input/Import Directory' are readable")
+            print(f"\nReview the console output above for more details")
+            print(f"{'='*70}\n")
         safe_pause()
         sys.exit(1)
+    finally:
+        shutdown_section_pool()
+        log_event('run', level=SUMMARY, duration_s=round(time.perf_counter() - run_started, 3),
+                  log_lines=LOG_LINE_COUNTER.count)
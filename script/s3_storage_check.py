@@ -0,0 +1,142 @@
+"""S3 storage backend check for the document processor
+
+Runs S3Storage against an in-process S3 (moto) and verifies the operations
+the pipeline relies on: listing the input prefix, parallel prefetch into the
+scratch directory (including a failed download), moves into processed/ with
+name collisions and markers (by scratch path and by key, dropping the scratch
+copy either way, listing each target prefix only once per run) and the
+multipart upload of the final output.
+
+Requires boto3 and moto (pip install boto3 moto); no AWS account or network
+access is needed.
+
+Usage:
+    python script/s3_storage_check.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    sys.exit("This check requires boto3 and moto (pip install boto3 moto)")
+
+import document_processor as dp
+
+BUCKET = 'doc-processor-check'
+CHUNK_MB = 5  # smallest part size S3 accepts
+OUTPUT_MB = 11  # -> 3 parts
+
+def _storage_config(scratch_dir):
+    config = dict(dp.CONFIG)
+    config['storage'] = dict(dp.CONFIG['storage'], backend='s3', bucket=BUCKET, endpoint_url=None,
+                             scratch_dir=scratch_dir, multipart_chunksize_mb=CHUNK_MB)
+    return config
+
+def run_checks(scratch_dir):
+    results = []
+
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"  {'✓' if ok else '✗'} {label}" + (f"  ({detail})" if detail and not ok else ""))
+
+    prefixes = dp.CONFIG['storage']['prefixes']
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket=BUCKET)
+    seeded = {
+        prefixes['input'] + 'Beleg 1.pdf': b'%PDF beleg',
+        prefixes['input'] + 'KSt Erklärung.pdf': b'%PDF kst',
+        prefixes['processed'] + 'Beleg 1.pdf': b'%PDF from an earlier run',
+    }
+    for key, body in seeded.items():
+        s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+    storage = dp.S3Storage(_storage_config(scratch_dir))
+    dp._STORAGE = storage  # move_file_to_error (failed prefetch) goes through get_storage()
+
+    listings = []
+    storage.client.meta.events.register('provide-client-params.s3.ListObjectsV2',
+                                        lambda params, **kwargs: listings.append(params['Prefix']))
+
+    # list
+    inputs = storage.list_files('input')
+    check("list_files('input') returns only top-level input keys",
+          inputs == sorted(k for k in seeded if k.startswith(prefixes['input'])
+                           and '/' not in k[len(prefixes['input']):]), inputs)
+
+    # prefetch
+    beleg_key = prefixes['input'] + 'Beleg 1.pdf'
+    kst_key = prefixes['input'] + 'KSt Erklärung.pdf'
+    missing_key = prefixes['input'] + 'Fehlt.pdf'
+    prefetched = storage.prefetch({'attachments': [beleg_key], 'kst': [kst_key, missing_key]})
+    beleg_local = (prefetched.get('attachments') or [None])[0]
+    kst_local = (prefetched.get('kst') or [None])[0]
+    check("prefetch downloads matched inputs to scratch",
+          beleg_local and open(beleg_local, 'rb').read() == seeded[beleg_key]
+          and kst_local and open(kst_local, 'rb').read() == seeded[kst_key], prefetched)
+    check("prefetch drops a failed download", prefetched.get('kst') == [kst_local], prefetched)
+
+    # move by scratch path, colliding with a file from an earlier run
+    listings.clear()
+    moved = storage.move(beleg_local, 'processed')
+    check("move by scratch path avoids the existing name",
+          moved == f"s3://{BUCKET}/{prefixes['processed']}Beleg 1_1.pdf", moved)
+    check("first move into processed/ lists it once", listings == [prefixes['processed']], listings)
+    check("move deletes the source key", beleg_key not in storage.list_files('input'))
+    check("move by scratch path removes the scratch copy", not os.path.exists(beleg_local))
+
+    # move by key (as the post-merge cleanup does), with a marker
+    moved = storage.move(kst_key, 'processed', 'UNUSED')
+    check("move by key applies the marker",
+          moved == f"s3://{BUCKET}/{prefixes['processed']}KSt Erklärung_UNUSED.pdf", moved)
+    check("move by key removes the scratch copy", not os.path.exists(kst_local))
+
+    # a second file with the same name later in the run
+    s3.put_object(Bucket=BUCKET, Key=beleg_key, Body=b'%PDF beleg again')
+    listings.clear()
+    moved = storage.move(beleg_key, 'processed')
+    check("later collision uses the next free name without re-listing",
+          moved == f"s3://{BUCKET}/{prefixes['processed']}Beleg 1_2.pdf" and not listings,
+          f"{moved}, listings={listings}")
+    check("moving a missing key returns None", storage.move(missing_key, 'processed') is None)
+
+    # multipart publish
+    output_path = storage.output_path('final_output.pdf')
+    with open(output_path, 'wb') as f:
+        f.write(os.urandom(OUTPUT_MB * 1024 * 1024))
+    published = storage.publish(output_path, 'output')
+    head = s3.head_object(Bucket=BUCKET, Key=prefixes['output'] + 'final_output.pdf')
+    parts = -(-OUTPUT_MB // CHUNK_MB)
+    check(f"publish uploads in {parts} parts",
+          head['ETag'].strip('"').endswith(f"-{parts}") and head['ContentLength'] == OUTPUT_MB * 1024 * 1024,
+          f"ETag={head['ETag']}")
+    check("publish returns the S3 URL and removes the scratch file",
+          published == f"s3://{BUCKET}/{prefixes['output']}final_output.pdf" and not os.path.exists(output_path),
+          published)
+
+    check("scratch directory is empty at the end", not os.listdir(scratch_dir), os.listdir(scratch_dir))
+    return results
+
+def main():
+    # moto never contacts AWS, but boto3 still wants a region and credentials
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        os.environ.setdefault(name, value)
+    dp.configure_logging('quiet')
+
+    scratch_dir = tempfile.mkdtemp(prefix='s3_check_')
+    try:
+        with mock_aws():
+            results = run_checks(scratch_dir)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    failures = results.count(False)
+    print(f"\n{'✓ All S3 storage checks passed' if not failures else f'✗ {failures} check(s) failed'}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
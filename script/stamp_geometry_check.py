@@ -0,0 +1,110 @@
+"""Stamp placement check for the document processor
+
+Stamps synthetic pages with every /Rotate value (0/90/180/270), both with a
+full cropbox and with an offset cropbox, using the same code path as
+merge_pdfs_strict. For each stamped page it then walks the content stream,
+tracking the transformation matrix, and verifies that every clip rectangle
+('re W n') covers the page's visible box. A clip that misses the visible box
+would hide the KOPIE watermark partly or completely.
+
+Usage:
+    python script/stamp_geometry_check.py
+"""
+import sys
+from io import BytesIO
+
+import PyPDF2
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4, letter
+
+import document_processor as dp
+
+ROTATIONS = (0, 90, 180, 270)
+# (label, page size, cropbox or None for the full mediabox)
+LAYOUTS = [
+    ('A4 full', A4, None),
+    ('Letter full', letter, None),
+    ('Letter offset crop', letter, (300, 400, 612, 792)),
+]
+TOLERANCE = 0.01
+
+def _source_page(size, rotation, crop):
+    buffer = BytesIO()
+    can = canvas.Canvas(buffer, pagesize=size)
+    can.drawString(72, 72, "content")
+    can.save()
+    page = PyPDF2.PdfReader(BytesIO(buffer.getvalue())).pages[0]
+    if rotation:
+        page.rotate(rotation)
+    if crop:
+        page.cropbox = PyPDF2.generic.RectangleObject(crop)
+    return page
+
+def _multiply(m, n):
+    """PDF matrix product m x n for (a, b, c, d, e, f) tuples"""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + b * c2, a * b2 + b * d2,
+            c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+def clip_boxes(page):
+    """Bounding boxes (in user space) of all clip rectangles in a page's content stream"""
+    content = PyPDF2.generic.ContentStream(page.get_contents(), page.pdf)
+    ctm = (1, 0, 0, 1, 0, 0)
+    stack = []
+    pending_rect = None
+    boxes = []
+    for operands, operator in content.operations:
+        if operator == b'q':
+            stack.append(ctm)
+        elif operator == b'Q':
+            ctm = stack.pop()
+        elif operator == b'cm':
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif operator == b're':
+            x, y, w, h = (float(v) for v in operands)
+            pending_rect = (x, y, w, h, ctm)
+        elif operator == b'W' and pending_rect:
+            x, y, w, h, m = pending_rect
+            a, b, c, d, e, f = m
+            corners = [(px * a + py * c + e, px * b + py * d + f)
+                       for px, py in ((x, y), (x + w, y), (x, y + h), (x + w, y + h))]
+            xs, ys = [p[0] for p in corners], [p[1] for p in corners]
+            boxes.append((min(xs), min(ys), max(xs), max(ys)))
+            pending_rect = None
+    return boxes
+
+def main():
+    failures = 0
+    stamps = {}
+    for label, size, crop in LAYOUTS:
+        for rotation in ROTATIONS:
+            for page_index in (0, 1):  # underlay and overlay stamping
+                page = _source_page(size, rotation, crop)
+                geometry = dp.PageGeometryTable([page])
+                stamped = dp._stamp_page(page, page_index, geometry, 0, stamps)
+
+                writer = PyPDF2.PdfWriter()
+                writer.add_page(stamped)
+                output = BytesIO()
+                writer.write(output)
+                result = PyPDF2.PdfReader(BytesIO(output.getvalue())).pages[0]
+
+                left, bottom, right, top = geometry.visible_box(0)
+                boxes = clip_boxes(result)
+                bad = [box for box in boxes
+                       if box[0] > left + TOLERANCE or box[1] > bottom + TOLERANCE
+                       or box[2] < right - TOLERANCE or box[3] < top - TOLERANCE]
+                ok = len(boxes) >= 2 and not bad
+                failures += not ok
+                mode = 'underlay' if page_index == 0 else 'overlay'
+                print(f"  {'✓' if ok else '✗'} {label:20} rotate={rotation:3} {mode:8} "
+                      f"clips={len(boxes)} visible=({left:.0f},{bottom:.0f},{right:.0f},{top:.0f})"
+                      + (f" uncovered={bad}" if bad else ""))
+
+    print(f"\n{'✓ All clips cover the visible box' if not failures else f'✗ {failures} case(s) failed'}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
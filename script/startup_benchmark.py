@@ -0,0 +1,114 @@
+"""Startup benchmark for the document processor
+
+Measures the import-time profile of document_processor (python -X importtime)
+and the cold vs warm wall-clock startup of the script and frozen (PyInstaller)
+entry points, then compares the results against STARTUP_BUDGET.
+
+Entry points are launched with --version, which loads the module and exits
+before touching any input, so the benchmark is safe to run on a live mandate.
+'cold' is the first launch of the session (run after a reboot or with a
+freshly built exe for a true cold start), 'warm' the median of the rest.
+
+Usage:
+    python script/startup_benchmark.py
+    python script/startup_benchmark.py --runs 20 --exe dist/document_processor/document_processor.exe
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+SCRIPT_ENTRY = os.path.join(SCRIPT_DIR, 'document_processor.py')
+# PyInstaller --onedir build (recommended); the --onefile exe is used if that is all there is
+FROZEN_ENTRY = os.path.join(PROJECT_ROOT, 'dist', 'document_processor', 'document_processor.exe')
+ONEFILE_ENTRY = os.path.join(PROJECT_ROOT, 'dist', 'document_processor.exe')
+
+# Startup budget in seconds (wall clock until --version returns)
+STARTUP_BUDGET = {
+    'script': {'cold': 1.0, 'warm': 0.25},
+    'frozen': {'cold': 4.0, 'warm': 1.0},
+}
+
+# Dependencies that must only be loaded on first use, never at startup
+HEAVY_MODULES = ('PyPDF2', 'reportlab', 'docx2pdf', 'boto3')
+
+def import_time_profile(top=15):
+    """Run python -X importtime on the module; returns (rows, heavy modules loaded)
+
+    rows are (cumulative_us, self_us, module) sorted by cumulative time.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import document_processor'],
+        cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+
+    loaded = {module.strip() for _, _, module in rows}
+    heavy = [name for name in HEAVY_MODULES if any(m == name or m.startswith(f"{name}.") for m in loaded)]
+    rows.sort(reverse=True)
+    return rows[:top], heavy
+
+def time_startup(command, runs):
+    """Launch command runs times; returns (cold, warm median) in seconds"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - started)
+    warm = statistics.median(timings[1:]) if len(timings) > 1 else timings[0]
+    return timings[0], warm
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure document processor startup against its budget")
+    parser.add_argument('--runs', type=int, default=10, help="launches per entry point (default: 10)")
+    default_exe = FROZEN_ENTRY if os.path.isfile(FROZEN_ENTRY) or not os.path.isfile(ONEFILE_ENTRY) else ONEFILE_ENTRY
+    parser.add_argument('--exe', default=default_exe, help="path to the frozen executable")
+    parser.add_argument('--top', type=int, default=15, help="import profile rows to show")
+    args = parser.parse_args(argv)
+
+    within_budget = True
+
+    print(f"{'='*70}")
+    print(f"Import-time profile (top {args.top} by cumulative time)")
+    print(f"{'='*70}")
+    rows, heavy = import_time_profile(args.top)
+    for cumulative_us, self_us, module in rows:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {module}")
+    if heavy:
+        within_budget = False
+        print(f"\n✗ Heavy modules imported at startup: {', '.join(heavy)}")
+    else:
+        print(f"\n✓ No heavy modules imported at startup")
+
+    entry_points = [('script', [sys.executable, SCRIPT_ENTRY, '--version'])]
+    if os.path.isfile(args.exe):
+        entry_points.append(('frozen', [args.exe, '--version']))
+    else:
+        print(f"\n⚠ Frozen entry point not found, skipping: {args.exe}")
+
+    print(f"\n{'='*70}")
+    print(f"Startup time ({args.runs} launches per entry point)")
+    print(f"{'='*70}")
+    for name, command in entry_points:
+        cold, warm = time_startup(command, args.runs)
+        budget = STARTUP_BUDGET[name]
+        for label, measured in (('cold', cold), ('warm', warm)):
+            ok = measured <= budget[label]
+            within_budget = within_budget and ok
+            mark = '✓' if ok else '✗'
+            print(f"  {mark} {name:6} {label}: {measured * 1000:7.1f} ms  (budget {budget[label] * 1000:.0f} ms)")
+
+    return 0 if within_budget else 1
+
+if __name__ == "__main__":
+    sys.exit(main())